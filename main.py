@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import atexit
 import os
+import re
 import sys
-import json
+import threading
+import tokenize
+import io
+import mmap
 import uuid
-from typing import Dict, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+import orjson
 import requests
 
 from tqdm import tqdm
@@ -16,143 +27,701 @@ from ollama import chat, ChatResponse
 # Gemini API
 from google import genai
 from google.genai import types
+from google.genai.client import AsyncClient as AsyncGeminiClient
 
 # OpenAI API, Groq API Key is OpenAI compatible
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
-from system_prompt import SYSTEM_PROMPT
+# Optional, only used to count prompt tokens, see count_tokens
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from system_prompt import MULTI_PROJECT_SYSTEM_PROMPT, README_MARKER, SYSTEM_PROMPT
 
 # When reading the codebase I want to ignore the following since they are not relevant
 # and are to big, might have to research to make sure that I'm getting most languages and frameworks
 # like python, rust, go, javascript, next.js projects etc.
 # If virtual environment name is not in IGNORE_DIRS then the prompt_content will be filled
 # with useless files that we don't want. And we might get errors like response headers too big
-IGNORE_DIRS = {'.venv', 'venv', 'myenv', '__pycache__', 'node_modules', 'build', 'dist',
-               'target', '.codecrafters', '.next'}
-IGNORE_EXTENSIONS = {'.o', '.dll', '.exe', '.yml'}
-IGNORE_FILES = {'Cargo.lock', 'Cargo.toml', 'package-lock.json', 'requirements.txt'}
+IGNORE_DIRS = frozenset({'.venv', 'venv', 'myenv', '__pycache__', 'node_modules', 'build',
+                         'dist', 'target', '.codecrafters', '.next'})
+IGNORE_EXTENSIONS = frozenset({'.o', '.dll', '.exe', '.yml'})
+IGNORE_FILES = frozenset({'Cargo.lock', 'Cargo.toml', 'package-lock.json', 'requirements.txt'})
+
+# All the file filters folded into one pattern so each entry is checked with a single match,
+# built from the sets above so those stay the place to edit: hidden files, ignored names
+# and ignored extensions
+IGNORE_FILE_RE = re.compile(
+    r'(?:\.'
+    r'|(?:' + '|'.join(re.escape(name) for name in sorted(IGNORE_FILES)) + r')\Z'
+    r'|.*(?:' + '|'.join(re.escape(ext) for ext in sorted(IGNORE_EXTENSIONS)) + r')\Z)',
+    re.DOTALL
+)
+
+# Files bigger than this are most likely generated (minified bundles, dumps, lockfiles)
+# and would only bloat the prompt
+MAX_FILE_BYTES = 256 * 1024
+# How much of a file to look at for NUL bytes to decide that it's binary
+BINARY_SNIFF_BYTES = 4096
+# Files at least this big are mmap'ed instead of read, see _read_content. Each mapping
+# holds a file descriptor until closed, the READ_AHEAD window keeps that number bounded
+MMAP_MIN_BYTES = 16 * 1024
+
+# Raw file content, either read into memory or mapped for the bigger files
+FileContent = Union[bytes, mmap.mmap]
+
+# Number of threads used to list directories concurrently while walking the codebase
+SCAN_WORKERS = 8
+# Directories listed serially before the rest of the walk is handed to the scan pool
+PARALLEL_WALK_MIN_DIRS = 2000
+# Number of threads used to read files concurrently in iter_codebase
+READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Files read ahead of the consumer, bounds how much of the codebase is held at once
+READ_AHEAD = 2 * READ_WORKERS
+
+# Default number of LLM requests in flight when generating for several directories
+MAX_CONCURRENCY = 4
+
+# Context window of the model used for each provider, in tokens
+OLLAMA_NUM_CTX = 64000  # Half max context window for gemma3 4b
+CONTEXT_WINDOWS = {'gemini': 1_000_000, 'openai': 128_000, 'groq': 128_000,
+                   'ollama': OLLAMA_NUM_CTX}
+# Share of the context window the prompt may take, the rest is left for the generated README
+PROMPT_CONTEXT_SHARE = 0.9
+
+# Part of the token budget kept for the list of files left out of the prompt
+OMITTED_LIST_TOKENS = 512
+
+# Files that say the most about a project, kept first when the prompt has to be cut,
+# see _file_priority
+ENTRY_POINT_STEMS = frozenset({'main', '__main__', 'app', 'index', 'server', 'cli', 'lib'})
+CONFIG_FILES = frozenset({'dockerfile', 'makefile', 'setup.py', 'setup.cfg', 'go.mod',
+                          'pom.xml', 'build.gradle'})
+CONFIG_EXTENSIONS = frozenset({'.toml', '.json', '.cfg', '.ini'})
+
+# With --marshal, small projects are packed into one request up to this many tokens,
+# and at most this many projects, leaving room in the context window for the output
+MARSHAL_TOKEN_BUDGET = 32000
+MARSHAL_MAX_PROJECTS = 4
+
+# Comments and blank runs cost prompt tokens without telling much about the project,
+# so they are stripped from the languages we know how to parse, see _minify
+# Languages with // and /* */ comments, grouped by how they quote literals:
+# ' only delimits single character literals (so Rust lifetimes aren't taken for one),
+# C++ adds R"(raw strings)", Rust r#"raw strings"#, Go `raw strings`, and in
+# JavaScript/TypeScript ' and ` delimit strings
+CHAR_LITERAL_EXTENSIONS = frozenset({'.c', '.cs', '.java', '.kt', '.scala', '.swift'})
+CPP_EXTENSIONS = frozenset({'.h', '.cc', '.cpp', '.hpp'})
+RUST_EXTENSIONS = frozenset({'.rs'})
+GO_EXTENSIONS = frozenset({'.go'})
+JS_EXTENSIONS = frozenset({'.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx'})
+C_LIKE_EXTENSIONS = (CHAR_LITERAL_EXTENSIONS | CPP_EXTENSIONS | RUST_EXTENSIONS
+                     | GO_EXTENSIONS | JS_EXTENSIONS)
+MINIFY_EXTENSIONS = C_LIKE_EXTENSIONS | {'.py'}
+
+_DOUBLE_QUOTED = rb'"(?:\\.|[^"\\\n])*"'
+# A single character or an escape like '\n', '\x41' or '\u{1F600}'
+_CHAR_LITERAL = rb"'(?:\\.[^'\\\n]{0,9}|[^'\\\n])'"
+_SINGLE_QUOTED = rb"'(?:\\.|[^'\\\n])*'"
+# R"delim(...)delim" with the optional u8, u, U and L encoding prefixes
+_CPP_RAW_STRING = rb'\b(?:u8|[uUL])?R"(?P<delim>[^()\\\s"]{0,16})\(.*?\)(?P=delim)"'
+# r"..." and r#"..."#, possibly as a byte string
+_RUST_RAW_STRING = rb'\bb?r(?P<hashes>#*)".*?"(?P=hashes)'
+_GO_RAW_STRING = rb'`[^`]*`'
+_TEMPLATE_STRING = rb'`(?:\\.|[^`\\])*`'
+
+_LINE_COMMENT = rb'//[^\n]*'
+# Only at the start of a line or after whitespace, so the // in a regex literal
+# like /https?:\/\// isn't taken for a comment
+_SPACED_LINE_COMMENT = rb'(?:^|(?<=[ \t]))//[^\n]*'
+
+def _comment_re(*literals: bytes, line_comment: bytes = _LINE_COMMENT) -> re.Pattern:
+    # Literals are matched too so comment markers inside them (like in URLs) are kept
+    return re.compile(rb'(' + rb'|'.join(literals) + rb')|/\*.*?\*/|' + line_comment,
+                      re.DOTALL | re.MULTILINE)
+
+_CHAR_LITERAL_COMMENT_RE = _comment_re(_DOUBLE_QUOTED, _CHAR_LITERAL)
+_CPP_COMMENT_RE = _comment_re(_CPP_RAW_STRING, _DOUBLE_QUOTED, _CHAR_LITERAL)
+_RUST_COMMENT_RE = _comment_re(_RUST_RAW_STRING, _DOUBLE_QUOTED, _CHAR_LITERAL)
+_GO_COMMENT_RE = _comment_re(_DOUBLE_QUOTED, _CHAR_LITERAL, _GO_RAW_STRING)
+_JS_COMMENT_RE = _comment_re(_DOUBLE_QUOTED, _SINGLE_QUOTED, _TEMPLATE_STRING,
+                             line_comment=_SPACED_LINE_COMMENT)
+_COMMENT_RES = {
+    **dict.fromkeys(CHAR_LITERAL_EXTENSIONS, _CHAR_LITERAL_COMMENT_RE),
+    **dict.fromkeys(CPP_EXTENSIONS, _CPP_COMMENT_RE),
+    **dict.fromkeys(RUST_EXTENSIONS, _RUST_COMMENT_RE),
+    **dict.fromkeys(GO_EXTENSIONS, _GO_COMMENT_RE),
+    **dict.fromkeys(JS_EXTENSIONS, _JS_COMMENT_RE),
+}
+_TRAILING_WHITESPACE_RE = re.compile(rb'[ \t]+$', re.MULTILINE)
+_BLANK_RUN_RE = re.compile(rb'\n{3,}')
+
+def _strip_python_comments(content: bytes) -> bytes:
+    try:
+        tokens = [token for token in tokenize.tokenize(io.BytesIO(content).readline)
+                  if token.type != tokenize.COMMENT]
+        return tokenize.untokenize(tokens)
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        # Not valid Python, send it as is
+        return content
+
+def _minify(content: bytes, extension: str) -> bytes:
+    """
+    Strips comments, trailing whitespace and runs of blank lines from source code.
+    Docstrings and string literals are kept.
+    """
+    # The whitespace cleanup below only knows \n line endings
+    content = content.replace(b'\r\n', b'\n')
+    if extension == '.py':
+        content = _strip_python_comments(content)
+    elif extension in _COMMENT_RES:
+        content = _COMMENT_RES[extension].sub(lambda match: match.group(1) or b'', content)
+
+    content = _TRAILING_WHITESPACE_RE.sub(b'', content)
+    return _BLANK_RUN_RE.sub(b'\n\n', content).lstrip(b'\n')
+
+def _read_one(path: str, directory_path: str, minify: bool = True,
+              with_tokens: bool = False) -> Tuple[str, Optional[FileContent], Optional[int]]:
+    """
+    Reads a single file, used as the worker for the iter_codebase read pool.
+    Source files in MINIFY_EXTENSIONS are passed through _minify when minify is set.
 
-def read_codebase(directory_path: str) -> Dict[str, str]:
+    Returns:
+        tuple[str, FileContent | None, int | None]: The path relative to directory_path,
+            the raw file content and, when with_tokens is set, its token count as laid
+            out in the prompt. Content is None if the file could not be read or is
+            skipped for being too big or binary.
     """
-    Reads relevant files in the directory and its subdirectories.
+    relative_path, content = _read_content(path, directory_path, minify)
+    # Counted here so tokenizing runs on the read pool rather than in the consumer
+    tokens = (_count_file_tokens(relative_path, content)
+              if with_tokens and content is not None else None)
+    return relative_path, content, tokens
 
-    Args:
-        directory_path (str): The path to the root directory of the codebase.
+def _read_content(path: str, directory_path: str,
+                  minify: bool) -> Tuple[str, Optional[FileContent]]:
+    relative_path = os.path.relpath(path, directory_path)
+
+    try:
+        with open(path, 'rb') as f:
+            # Size check is done here on the open fd rather than in the walk, so the
+            # stat calls run concurrently on the read pool instead of one by one
+            size = os.fstat(f.fileno()).st_size
+            if size > MAX_FILE_BYTES:
+                return relative_path, None
+
+            extension = os.path.splitext(path)[1]
+            minify = minify and extension in MINIFY_EXTENSIONS
+
+            # Minified files are rewritten anyway, so there is nothing to gain from a mapping
+            if size >= MMAP_MIN_BYTES and not minify:
+                # Map bigger files instead of reading them, the prompt buffer then copies
+                # straight from the page cache without an intermediate bytes object
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if mapped.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1:
+                    mapped.close()
+                    return relative_path, None
+                return relative_path, mapped
+            head = f.read(BINARY_SNIFF_BYTES)
+            if b'\0' in head:
+                return relative_path, None
+            content = head + f.read()
+            if minify:
+                content = _minify(content, extension)
+            return relative_path, content
+    except Exception as e:
+        print(f"Error reading {relative_path}: {e}")
+        return relative_path, None
+
+def _scan_directory(path: str) -> Tuple[List[str], List[str]]:
+    """
+    Lists a single directory, used as the worker for the iter_codebase walk.
 
     Returns:
-        dict[str, str]: A dictionary where keys are relative file paths and values
-                        are the content of the files.
-                        Returns and empty dict if the directory is invalid.
-        bool: A boolean set if a README.md is found in the project directory.
+        tuple[list[str], list[str]]: The subdirectories to walk into and the relevant files.
     """
-    code_contents = {}
+    subdirs = []
+    files = []
 
-    if not os.path.isdir(directory_path):
-        print(f"Error: Directory not found: {directory_path}", file=sys.stderr)
+    # os.scandir's DirEntry caches the file type from the directory listing
+    # so we don't pay a stat per entry
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        # Same as os.walk, skip directories we can't list
+        return subdirs, files
 
-    # print(f"Scanning directory: {directory_path}")
+    for entry in entries:
+        name = entry.name
+        if entry.is_dir(follow_symlinks=False):
+            # Directory Filtering, ignored dirs are never opened
+            if name not in IGNORE_DIRS and not name.startswith('.'):
+                subdirs.append(entry.path)
+            continue
 
-    for root, dirs, files in tqdm(os.walk(directory_path, topdown=True), desc='Scanning directory'):
-        # Directory Filtering
-        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS and not d.startswith('.')]
+        if not entry.is_file(follow_symlinks=False):
+            continue
 
-        relative_root = os.path.relpath(root, directory_path)
+        # File Filtering
+        if IGNORE_FILE_RE.match(name):
+            continue
 
-        if relative_root == ".":
-            relative_root = ""  # Avoid "./filename" -> "filename"
+        files.append(entry.path)
 
-        for filename in files:
-            # File Filtering
-            if filename in IGNORE_FILES or filename.startswith('.'):
-                continue
-            _, extension = os.path.splitext(filename)
-            if extension in IGNORE_EXTENSIONS:
-                continue
+    return subdirs, files
 
-            relative_path = os.path.join(relative_root, filename)
+def _walk_directories(stack: List[str],
+                      max_dirs: Optional[int] = None) -> Tuple[List[str], int]:
+    """
+    Walks depth first from the directories on the stack, leaving whatever is still
+    unlisted on the stack once max_dirs directories have been listed.
 
-            try:
-                with open(os.path.join(root, filename),
-                          'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    # Store the association
-                    code_contents[relative_path] = content
-            except Exception as e:
-                print(f"Error reading {relative_path}: {e}")
-
-    if not code_contents:
+    Returns:
+        tuple[list[str], int]: The relevant files found and the number of directories listed.
+    """
+    file_paths = []
+    listed = 0
+    while stack and (max_dirs is None or listed < max_dirs):
+        subdirs, files = _scan_directory(stack.pop())
+        file_paths.extend(files)
+        stack.extend(subdirs)
+        listed += 1
+
+    return file_paths, listed
+
+def iter_codebase(directory_path: str,
+                  minify: bool = True,
+                  with_tokens: bool = False
+                  ) -> Iterator[Tuple[str, FileContent, Optional[int]]]:
+    """
+    Reads relevant files in the directory and its subdirectories, yielding them one at a
+    time so they can go straight into the prompt without holding the whole codebase.
+    Files are yielded most important first, see _file_priority.
+
+    Args:
+        directory_path (str): The path to the root directory of the codebase.
+        minify (bool): Strip comments and blank runs from known source files.
+        with_tokens (bool): Also count each file's prompt tokens on the read pool.
+
+    Yields:
+        tuple[str, FileContent, int | None]: The relative file path, the raw content of
+                                             the file, decoded when formatting, and its
+                                             token count if with_tokens is set.
+    """
+    if not os.path.isdir(directory_path):
+        print(f"Error: Directory not found: {directory_path}", file=sys.stderr)
+
+    # print(f"Scanning directory: {directory_path}")
+
+    with tqdm(desc='Scanning directory') as progress:
+        # Listings that hit the page cache are too quick to win anything from a pool,
+        # so walk serially and only fan out once the tree turns out to be large
+        stack = [directory_path]
+        file_paths, listed = _walk_directories(stack, PARALLEL_WALK_MIN_DIRS)
+        progress.update(listed)
+
+        if stack:
+            # Each worker walks a whole unlisted subtree on its own, a task per directory
+            # costs more in scheduling than the listing itself
+            with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+                for files, listed in executor.map(lambda subtree: _walk_directories([subtree]),
+                                                  stack):
+                    file_paths.extend(files)
+                    progress.update(listed)
+
+    file_paths.sort(key=lambda path: _file_priority(os.path.relpath(path, directory_path)))
+
+    files_read = 0
+    # Reads are I/O bound and release the GIL, so overlap them on a thread pool.
+    # Only READ_AHEAD files are in flight at once, topped up as the caller consumes them
+    # in order, so a slow consumer doesn't end up with the whole codebase in memory
+    remaining_paths = iter(file_paths)
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor, \
+            tqdm(total=len(file_paths), desc='Reading files') as progress:
+        def submit(path: str) -> Future:
+            return executor.submit(_read_one, path, directory_path, minify, with_tokens)
+
+        pending = deque(submit(path) for path in islice(remaining_paths, READ_AHEAD))
+        while pending:
+            relative_path, content, tokens = pending.popleft().result()
+            for path in islice(remaining_paths, 1):
+                pending.append(submit(path))
+            progress.update()
+            if content is not None:
+                files_read += 1
+                yield relative_path, content, tokens
+
+    if not files_read:
         print("Warning: No relevant files found or read in the specfied directory.",
               file=sys.stderr)
 
+def read_codebase(directory_path: str, minify: bool = True) -> Dict[str, FileContent]:
+    """
+    Same as iter_codebase but collects everything in a dictionary, for callers that need
+    random access to the files. Mapped files are copied out and closed as they come in,
+    since holding every mapping open would hold a file descriptor per file.
+
+    Returns:
+        dict[str, FileContent]: A dictionary where keys are relative file paths and values
+                                are the raw content of the files, decoded when formatting.
+                                Returns and empty dict if the directory is invalid.
+    """
+    code_contents = {}
+    for relative_path, content, _ in iter_codebase(directory_path, minify):
+        if isinstance(content, mmap.mmap):
+            mapped = content
+            content = mapped[:]
+            mapped.close()
+        code_contents[relative_path] = content
+
     return code_contents
 
-def format_codebase_for_prompt(code_contents: dict[str, str]):
+def _close_content(content: FileContent) -> None:
+    if isinstance(content, mmap.mmap):
+        content.close()
+
+def format_codebase_for_prompt(code_contents: Union[Dict[str, FileContent],
+                                                    Iterable[Tuple[str, FileContent,
+                                                                   Optional[int]]]],
+                               token_budget: Optional[int] = None):
     """
     Formats the collected codebase content into a single string for an AI prompt.
+    The raw file bytes are concatenated first and decoded once at the end.
+
+    Args:
+        code_contents: The files from read_codebase, or the iter_codebase iterator to
+                       stream them in. Mapped files are closed once copied into the prompt.
+                       Token counts missing from the iterator are computed here.
+        token_budget (int | None): When set, files that would take the prompt over this
+                                   many tokens are left out and listed by name at the end,
+                                   the list is cut short to stay within
+                                   OMITTED_LIST_TOKENS. Files are considered in the order
+                                   given.
     """
-    if not code_contents:
+    if isinstance(code_contents, dict):
+        code_contents = ((file_path, content, None)
+                         for file_path, content in code_contents.items())
+
+    omitted_files = []
+    total_tokens = 0
+    files_added = 0
+
+    header = "Project Files:\n\n"
+    if token_budget is not None:
+        # The header and the [Omitted] list go into the prompt too, keep room for them
+        token_budget -= count_tokens(header)
+        omitted_budget = max(0, min(OMITTED_LIST_TOKENS, token_budget))
+        token_budget -= omitted_budget
+
+    # Grow a single buffer in place, += on str would copy the whole prompt every time
+    prompt_bytes = bytearray(header.encode('utf-8'))
+    for file_path, content, file_tokens in code_contents:
+        if token_budget is not None:
+            if file_tokens is None:
+                file_tokens = _count_file_tokens(file_path, content)
+            if total_tokens + file_tokens > token_budget:
+                omitted_files.append(file_path)
+                _close_content(content)
+                continue
+            total_tokens += file_tokens
+
+        prompt_bytes.extend(b"--- File: ")
+        prompt_bytes.extend(os.fsencode(file_path))
+        prompt_bytes.extend(b" ---\n```\n")  # Using ``` for code blocks
+        prompt_bytes.extend(content)
+        prompt_bytes.extend(b"\n```\n\n")
+        _close_content(content)
+        files_added += 1
+
+    if not files_added and not omitted_files:
         return "No code content was read from the directory."
 
-    prompt_string = "Project Files:\n\n"
-    for file_path, content in tqdm(code_contents.items(), desc='Formatting'):
-        prompt_string += f"--- File: {file_path} ---\n"
-        prompt_string += f"```\n{content}\n```\n\n"  # Using ``` for code blocks
+    if omitted_files:
+        prompt_bytes.extend(_format_omitted_files(omitted_files, omitted_budget))
+
+    return prompt_bytes.decode('utf-8', errors='ignore')
+
+def _format_omitted_files(omitted_files: List[str], token_budget: int) -> bytes:
+    # Lists the omitted files while they fit in token_budget, the rest are only counted
+    title = "[Omitted] Files left out to fit the context window:\n"
+    # Room for the "... and N more" line, N can't have more digits than this
+    more_tokens = count_tokens(f"- ... and {len(omitted_files)} more\n")
+    remaining = token_budget - count_tokens(title) - more_tokens
+    if remaining < 0:
+        return b""
+
+    lines = [title]
+    for listed, file_path in enumerate(omitted_files):
+        line = f"- {file_path}\n"
+        line_tokens = count_tokens(line)
+        if line_tokens > remaining:
+            lines.append(f"- ... and {len(omitted_files) - listed} more\n")
+            break
+        lines.append(line)
+        remaining -= line_tokens
+
+    return "".join(lines).encode('utf-8', errors='ignore')
+
+def build_prompt(directory_path: str,
+                 minify: bool = True,
+                 token_budget: Optional[int] = None) -> Optional[str]:
+    """
+    Streams the codebase straight into the prompt, see iter_codebase and
+    format_codebase_for_prompt.
 
-    return prompt_string
+    Returns:
+        str | None: The formatted prompt content, None if no relevant file could be read.
+    """
+    files = iter_codebase(directory_path, minify, with_tokens=token_budget is not None)
+    first_file = next(files, None)
+    if first_file is None:
+        return None
+
+    return format_codebase_for_prompt(chain([first_file], files), token_budget)
+
+@lru_cache(maxsize=None)
+def _token_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # The encoding is downloaded on first use, fall back to the estimate when offline
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens in text with tiktoken's cl100k_base encoding, which is close enough
+    for all the supported models. Falls back to about 4 characters per token when
+    tiktoken isn't available.
+    """
+    encoding = _token_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _file_priority(relative_path: str) -> Tuple[int, int, str]:
+    # Lower sorts first: READMEs, entry points, manifests/configs, then everything else,
+    # shallower files first within each group
+    name = os.path.basename(relative_path).lower()
+    stem, extension = os.path.splitext(name)
+    if stem == 'readme':
+        rank = 0
+    elif stem in ENTRY_POINT_STEMS:
+        rank = 1
+    elif name in CONFIG_FILES or extension in CONFIG_EXTENSIONS:
+        rank = 2
+    else:
+        rank = 3
+    return rank, relative_path.count(os.sep), relative_path
+
+def _count_file_tokens(file_path: str, content: FileContent) -> int:
+    # Counted the way format_codebase_for_prompt lays the file out, decoded straight
+    # from the buffer so a mapping isn't copied into a bytes object first
+    text = str(content, 'utf-8', 'ignore')
+    return count_tokens(f"--- File: {file_path} ---\n```\n{text}\n```\n\n")
+
+def prompt_token_budget(gemini_api_key: str | None,
+                        openai_api_key: str | None,
+                        groq_api_key: str | None,
+                        system_prompt: str = SYSTEM_PROMPT) -> int:
+    # Same provider order as handle_generation, system_prompt is the one the prompt is
+    # sent with
+    if gemini_api_key:
+        context_window = CONTEXT_WINDOWS['gemini']
+    elif openai_api_key:
+        context_window = CONTEXT_WINDOWS['openai']
+    elif groq_api_key:
+        context_window = CONTEXT_WINDOWS['groq']
+    else:
+        context_window = CONTEXT_WINDOWS['ollama']
+
+    return int(context_window * PROMPT_CONTEXT_SHARE) - count_tokens(system_prompt)
+
+def format_multi_codebase_for_prompt(projects: List[Tuple[str, str]]) -> str:
+    """
+    Packs several projects into a single prompt, meant to be sent with
+    MULTI_PROJECT_SYSTEM_PROMPT.
+
+    Args:
+        projects (list[tuple[str, str]]): The project name and its prompt content from
+                                          format_codebase_for_prompt.
+    """
+    parts = []
+    for index, (name, prompt_content) in enumerate(projects, start=1):
+        parts.append(f"=== Project {index}: {name} ===\n")
+        parts.append(prompt_content)
+        parts.append("\n")
+
+    return "".join(parts)
+
+def marshal_prompts(prompts: List[str],
+                    token_budget: int = MARSHAL_TOKEN_BUDGET,
+                    max_projects: int = MARSHAL_MAX_PROJECTS) -> List[List[int]]:
+    """
+    Greedily groups consecutive prompts so each group fits in token_budget.
+    A prompt that is over the budget on its own gets a group to itself.
+
+    Returns:
+        list[list[int]]: The indices into prompts for each group.
+    """
+    groups = []
+    group = []
+    group_tokens = 0
+    for index, prompt_content in enumerate(prompts):
+        tokens = count_tokens(prompt_content)
+        if group and (group_tokens + tokens > token_budget or len(group) >= max_projects):
+            groups.append(group)
+            group = []
+            group_tokens = 0
+        group.append(index)
+        group_tokens += tokens
+
+    if group:
+        groups.append(group)
+
+    return groups
+
+_README_MARKER_RE = re.compile(
+    r'^[ \t]*' + r'(\d+)'.join(re.escape(part) for part in README_MARKER.split('{index}'))
+    + r'[ \t]*$',
+    re.MULTILINE
+)
+
+def split_multi_readme_output(ai_response_string: str, count: int) -> List[str]:
+    """
+    Splits a response to MULTI_PROJECT_SYSTEM_PROMPT back into one README per project.
+
+    Raises:
+        ValueError: If the response doesn't contain a README for every project.
+    """
+    # Models sometimes fence the whole reply, which would leave the closing fence
+    # at the end of the last README
+    ai_response_string = clean_ai_output(ai_response_string)
+    matches = list(_README_MARKER_RE.finditer(ai_response_string))
+    readmes = {}
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = next_match.start() if next_match else len(ai_response_string)
+        readmes[int(match.group(1))] = ai_response_string[match.end():end].strip('\n')
+
+    missing = [index for index in range(1, count + 1) if index not in readmes]
+    if missing:
+        raise ValueError(f"The response is missing the README for project(s) {missing}.")
+
+    return [readmes[index] for index in range(1, count + 1)]
+
+@lru_cache(maxsize=None)
+def _system_msg(system_prompt: str) -> Dict[str, str]:
+    # The system message is the same for every request, build it once per prompt
+    return {'role': 'system', 'content': sys.intern(system_prompt)}
+
+_SYSTEM_MSG = _system_msg(SYSTEM_PROMPT)
 
 # Issues?
 def generate_with_ollama_api(formatted_prompt_content: str) -> str:
-    response: ChatResponse = chat(
+    stream: Iterator[ChatResponse] = chat(
         model='llama3.2:3b',
         messages=[
-            {'role': 'system', 'content': SYSTEM_PROMPT},
+            _SYSTEM_MSG,
             {'role': 'user', 'content': formatted_prompt_content},
         ],
-        stream=False,
+        stream=True,
         options={
             'num_ctx': 128000  # Max context window for gemma3 4b
         }
     )
-    res = response['message']['content']
+    res = "".join(chunk['message']['content'] for chunk in stream)
     return res
 
-def generate_with_ollama(formatted_prompt_content: str) -> str:
-    url = 'http://localhost:11434/api/chat'
-    data = {
+OLLAMA_URL = 'http://localhost:11434/api/chat'
+# One session per thread, reused for every Ollama request made from that thread so the
+# connection is kept alive between calls. requests doesn't promise a Session is safe to
+# share between threads, and --batch-dirs runs several requests at once in threads
+_THREAD_LOCAL = threading.local()
+_SESSIONS: List[requests.Session] = []
+
+def _session() -> requests.Session:
+    session = getattr(_THREAD_LOCAL, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        _THREAD_LOCAL.session = session
+        _SESSIONS.append(session)
+    return session
+
+@atexit.register
+def _close_sessions() -> None:
+    for session in _SESSIONS:
+        session.close()
+
+# Placeholder that marks where the JSON encoded user content goes
+_OLLAMA_USER_PLACEHOLDER = b'"__USER__"'
+
+@lru_cache(maxsize=None)
+def _ollama_request_template(system_prompt: str) -> Tuple[bytes, bytes]:
+    # Request body serialized once per system prompt and split around the user content,
+    # so a call only encodes its own content and joins three buffers, without
+    # re-encoding or even scanning the multi-KB system prompt
+    template = orjson.dumps({
         'model': 'llama3.2:3b',
         'messages': [
-            {'role': 'system', 'content': SYSTEM_PROMPT},
-            {'role': 'user', 'content': formatted_prompt_content},
+            _system_msg(system_prompt),
+            {'role': 'user', 'content': '__USER__'},
         ],
-        'stream': False,
+        'stream': True,
         'options': {
-            'num_ctx': 64000  # Half max context window for gemma3 4b
+            'num_ctx': OLLAMA_NUM_CTX
         }
-    }
-    headers = {'Content-Type': 'application/json'}
+    })
+    prefix, _, suffix = template.partition(_OLLAMA_USER_PLACEHOLDER)
+    return prefix, suffix
+
+def generate_with_ollama(formatted_prompt_content: str,
+                         system_prompt: str = SYSTEM_PROMPT,
+                         echo: bool = True) -> str:
+    # echo prints the tokens as they stream in, turned off when several requests run at
+    # once so their output doesn't get mixed together
+    url = OLLAMA_URL
+    prefix, suffix = _ollama_request_template(system_prompt)
+    data = b''.join((prefix, orjson.dumps(formatted_prompt_content), suffix))
 
     try:
-        response = requests.post(url, json=data, headers=headers)
-
-        # Check for HTTP errors (like 404, 500, etc.)
-        response.raise_for_status()
-
-        res = response.json()
-
-        if 'message' in res and 'content' in res['message']:
-            print('\n', res['message']['content'], '\n')
-            return res['message']['content']
-
-        print("Unexpected JSON structure in response.")
-        print(res)
-        return ""
+        # Streamed as NDJSON, one chunk of the message per line, so tokens are shown
+        # as they are generated instead of after the whole response
+        with _session().post(url, data=data, stream=True) as response:
+            # Check for HTTP errors (like 404, 500, etc.)
+            response.raise_for_status()
+
+            content_parts = []
+            if echo:
+                print()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                res = orjson.loads(line)
+
+                if 'message' in res and 'content' in res['message']:
+                    if echo:
+                        print(res['message']['content'], end='', flush=True)
+                    content_parts.append(res['message']['content'])
+                elif not res.get('done'):
+                    print("\nUnexpected JSON structure in response.")
+                    print(res)
+                    return ""
+            if echo:
+                print('\n')
+
+        return "".join(content_parts)
     except requests.exceptions.Timeout:
         print("Timed out")
         return ""
     except requests.exceptions.RequestException as e:
         print(f"Error during Ollama request {e}")
         return ""
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print("Error: Failed to decode JSON response.")
         return ""
 
@@ -169,38 +738,37 @@ def clean_ai_output(ai_response_string: str) -> str:
     if not ai_response_string:
         return ""
 
-    lines = ai_response_string.splitlines(keepends=True)
+    # Only look at the first and last lines by index, no need to split the whole response
+    first_line_end = ai_response_string.find('\n')
+    if first_line_end == -1:
+        return ai_response_string
 
-    if not lines:
-        return ""
-
-    starts_with_fence = False
-    ends_with_fence = False
-
-    first_line_stripped = lines[0].strip()
-    last_line_stripped = lines[-1].strip()
+    first_line_stripped = ai_response_string[:first_line_end].strip()
+    if first_line_stripped.lower() != "```markdown" and first_line_stripped != "```":
+        return ai_response_string
 
-    if first_line_stripped.lower() == "```markdown" or first_line_stripped == "```":
-        starts_with_fence = True
-    if starts_with_fence and last_line_stripped.lower() == "```":
-        ends_with_fence = True
+    last_line_end = len(ai_response_string)
+    if ai_response_string.endswith('\n'):
+        last_line_end -= 1
+    last_line_start = ai_response_string.rfind('\n', 0, last_line_end) + 1
 
-    cleaned_lines = lines
+    # The first and last lines have to be different lines
+    if last_line_start <= first_line_end:
+        return ai_response_string
 
-    if starts_with_fence and ends_with_fence and len(lines) >= 2:
-        cleaned_lines = lines[1:-1]
+    if ai_response_string[last_line_start:last_line_end].strip() != "```":
+        return ai_response_string
 
-    cleaned_response = "".join(cleaned_lines)
+    return ai_response_string[first_line_end + 1:last_line_start]
 
-    return cleaned_response
-
-def generate_with_gemini(prompt_content: str, gemini_api_key: str) -> str:
+def generate_with_gemini(prompt_content: str, gemini_api_key: str,
+                         system_prompt: str = SYSTEM_PROMPT) -> str:
     client = genai.Client(api_key=gemini_api_key)
 
     response = client.models.generate_content(
         model='gemini-2.0-flash',
         config=types.GenerateContentConfig(
-            system_instruction=SYSTEM_PROMPT
+            system_instruction=system_prompt
         ),
         contents=prompt_content
     )
@@ -211,13 +779,14 @@ def generate_with_gemini(prompt_content: str, gemini_api_key: str) -> str:
 
     return content
 
-def generate_with_openai(prompt_content: str, openai_api_key: str) -> str:
+def generate_with_openai(prompt_content: str, openai_api_key: str,
+                         system_prompt: str = SYSTEM_PROMPT) -> str:
     client = OpenAI(api_key=openai_api_key)
 
     response = client.chat.completions.create(
         model='gpt-4o-mini',
         messages=[
-            {'role': 'system', 'content': SYSTEM_PROMPT},
+            _system_msg(system_prompt),
             {'role': 'user', 'content': prompt_content},
         ],
     )
@@ -228,14 +797,15 @@ def generate_with_openai(prompt_content: str, openai_api_key: str) -> str:
 
     return content
 
-def generate_with_groq(prompt_content: str, groq_api_key: str) -> str:
+def generate_with_groq(prompt_content: str, groq_api_key: str,
+                       system_prompt: str = SYSTEM_PROMPT) -> str:
     client = OpenAI(base_url='https://api.groq.com/openai/v1',
                     api_key=groq_api_key)
 
     response = client.chat.completions.create(
         model='llama-3.3-70b-versatile',
         messages=[
-            {'role': 'system', 'content': SYSTEM_PROMPT},
+            _system_msg(system_prompt),
             {'role': 'user', 'content': prompt_content},
         ],
     )
@@ -249,26 +819,239 @@ def generate_with_groq(prompt_content: str, groq_api_key: str) -> str:
 def handle_generation(prompt_content: str,
                       gemini_api_key: str | None,
                       openai_api_key: str | None,
-                      groq_api_key: str | None) -> str:
+                      groq_api_key: str | None,
+                      system_prompt: str = SYSTEM_PROMPT) -> str:
     # Handle generating README.md with AI models like Gemini, ChatGPT, etc, given their API keys
     if gemini_api_key:
-        return generate_with_gemini(prompt_content, gemini_api_key)
+        return generate_with_gemini(prompt_content, gemini_api_key, system_prompt)
     if openai_api_key:
-        return generate_with_openai(prompt_content, openai_api_key)
+        return generate_with_openai(prompt_content, openai_api_key, system_prompt)
     if groq_api_key:
-        return generate_with_groq(prompt_content, groq_api_key)
+        return generate_with_groq(prompt_content, groq_api_key, system_prompt)
 
     print('\n', prompt_content, '\n')
     # Default is Ollama API, local
-    return generate_with_ollama(prompt_content)
+    return generate_with_ollama(prompt_content, system_prompt)
+
+async def agenerate_with_gemini(prompt_content: str, client: AsyncGeminiClient,
+                                system_prompt: str = SYSTEM_PROMPT) -> str:
+    response = await client.models.generate_content(
+        model='gemini-2.0-flash',
+        config=types.GenerateContentConfig(
+            system_instruction=system_prompt
+        ),
+        contents=prompt_content
+    )
+
+    content: Optional[str] = response.text
+    if not content:
+        raise ValueError("The response content is None.")
+
+    return content
+
+async def agenerate_with_openai(prompt_content: str, client: AsyncOpenAI,
+                                system_prompt: str = SYSTEM_PROMPT) -> str:
+    response = await client.chat.completions.create(
+        model='gpt-4o-mini',
+        messages=[
+            _system_msg(system_prompt),
+            {'role': 'user', 'content': prompt_content},
+        ],
+    )
+
+    content: Optional[str] = response.choices[0].message.content
+    if not content:
+        raise ValueError("The response content is None.")
+
+    return content
+
+async def agenerate_with_groq(prompt_content: str, client: AsyncOpenAI,
+                              system_prompt: str = SYSTEM_PROMPT) -> str:
+    response = await client.chat.completions.create(
+        model='llama-3.3-70b-versatile',
+        messages=[
+            _system_msg(system_prompt),
+            {'role': 'user', 'content': prompt_content},
+        ],
+    )
+
+    content: Optional[str] = response.choices[0].message.content
+    if not content:
+        raise ValueError("The response content is None.")
+
+    return content
+
+def _async_client(gemini_api_key: str | None,
+                  openai_api_key: str | None,
+                  groq_api_key: str | None) -> Union[AsyncGeminiClient, AsyncOpenAI, None]:
+    # One client, and so one connection pool, shared by all the requests of a batch.
+    # Same provider order as handle_generation, None for the local Ollama API
+    if gemini_api_key:
+        return genai.Client(api_key=gemini_api_key).aio
+    if openai_api_key:
+        return AsyncOpenAI(api_key=openai_api_key)
+    if groq_api_key:
+        return AsyncOpenAI(base_url='https://api.groq.com/openai/v1',
+                           api_key=groq_api_key)
+    return None
+
+async def _close_async_client(client: Union[AsyncGeminiClient, AsyncOpenAI, None]) -> None:
+    if isinstance(client, AsyncOpenAI):
+        await client.close()
+    elif client is not None and hasattr(client, 'aclose'):
+        # Only newer google-genai releases can close their async client explicitly,
+        # older ones release the connections when the client is garbage collected
+        await client.aclose()
+
+async def handle_generation_async(prompt_content: str,
+                                  gemini_api_key: str | None,
+                                  openai_api_key: str | None,
+                                  groq_api_key: str | None,
+                                  client: Union[AsyncGeminiClient, AsyncOpenAI, None],
+                                  system_prompt: str = SYSTEM_PROMPT) -> str:
+    # Same provider order as handle_generation, client comes from _async_client
+    if gemini_api_key:
+        return await agenerate_with_gemini(prompt_content, client, system_prompt)
+    if openai_api_key:
+        return await agenerate_with_openai(prompt_content, client, system_prompt)
+    if groq_api_key:
+        return await agenerate_with_groq(prompt_content, client, system_prompt)
+
+    # Default is Ollama API, local. It goes through requests which is blocking,
+    # so run it in a thread to not stall the event loop
+    return await asyncio.to_thread(generate_with_ollama, prompt_content, system_prompt,
+                                   echo=False)
+
+async def handle_generation_many(prompts: List[str],
+                                 gemini_api_key: str | None,
+                                 openai_api_key: str | None,
+                                 groq_api_key: str | None,
+                                 max_concurrency: int = MAX_CONCURRENCY,
+                                 system_prompt: str = SYSTEM_PROMPT
+                                 ) -> List[Union[str, BaseException]]:
+    """
+    Generates a README for each prompt concurrently.
+
+    Args:
+        prompts (list[str]): The formatted prompt content, one per project.
+        max_concurrency (int): Maximum number of requests in flight at once, keeps us
+                               under the provider's rate limits.
+
+    Returns:
+        list[str | BaseException]: The generated content in the same order as prompts,
+                                   or the exception raised for that prompt.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    client = _async_client(gemini_api_key, openai_api_key, groq_api_key)
+
+    async def generate(prompt_content: str) -> str:
+        async with semaphore:
+            return await handle_generation_async(prompt_content,
+                                                 gemini_api_key,
+                                                 openai_api_key,
+                                                 groq_api_key,
+                                                 client,
+                                                 system_prompt)
+
+    try:
+        tasks = [asyncio.create_task(generate(prompt_content)) for prompt_content in prompts]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await _close_async_client(client)
+
+async def handle_generation_marshaled(projects: List[Tuple[str, str]],
+                                     gemini_api_key: str | None,
+                                     openai_api_key: str | None,
+                                     groq_api_key: str | None,
+                                     max_concurrency: int = MAX_CONCURRENCY
+                                     ) -> List[Union[str, BaseException]]:
+    """
+    Like handle_generation_many, but packs several small projects into each request.
+
+    Args:
+        projects (list[tuple[str, str]]): The project name and its prompt content from
+                                          format_codebase_for_prompt.
+
+    Returns:
+        list[str | BaseException]: The generated content in the same order as projects,
+                                   or the exception raised for that project's request.
+    """
+    groups = marshal_prompts([prompt_content for _, prompt_content in projects])
+    packed_prompts = [format_multi_codebase_for_prompt([projects[index] for index in group])
+                      for group in groups]
+
+    responses = await handle_generation_many(packed_prompts,
+                                             gemini_api_key,
+                                             openai_api_key,
+                                             groq_api_key,
+                                             max_concurrency,
+                                             MULTI_PROJECT_SYSTEM_PROMPT)
+
+    results: Dict[int, Union[str, BaseException]] = {}
+    for group, response in zip(groups, responses):
+        if not isinstance(response, BaseException):
+            try:
+                response = split_multi_readme_output(response, len(group))
+            except ValueError as e:
+                response = e
+        for position, index in enumerate(group):
+            results[index] = (response if isinstance(response, BaseException)
+                              else response[position])
+
+    return [results[index] for index in range(len(projects))]
+
+def _write_file(path: str, data: bytes) -> None:
+    # Write the already encoded buffer straight to the fd, skipping the text layer
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+def save_readme(raw_readme: str, output_file: str | None) -> None:
+    data = raw_readme.encode('utf-8')
+
+    if output_file:
+        print(output_file)
+        # Generate readme with AI and save to output_file
+        try:
+            _write_file(output_file, data)
+            print(f"\nGenerated README.md saved to {output_file}")
+        except IOError as e:
+            print(f"\nError writing to output file {output_file}: {e}", file=sys.stderr)
+    else:
+        # Generate readme with AI and save to /tmp/
+        output_dir = '/tmp/generated_readme'
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+            print(f"Directory created: {output_dir}")
+
+        output_filename = str(uuid.uuid4()) + '.md'
+        output_path = os.path.join(output_dir, output_filename)
+
+        _write_file(output_path, data)
+        print(f"\nGenerated README.md saved to {output_path}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Generate readme')
-    parser.add_argument('-d', '--directory',
-                        metavar='path',
-                        type=str,
-                        required=True,
-                        help='Path to the project directory')
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument('-d', '--directory',
+                              metavar='path',
+                              type=str,
+                              help='Path to the project directory')
+    target_group.add_argument('--batch-dirs',
+                              metavar='path',
+                              type=str,
+                              nargs='+',
+                              help='Paths to several project directories, READMEs are '
+                                   'generated concurrently and saved to /tmp/generated_readme')
+    parser.add_argument('--marshal',
+                        action='store_true',
+                        help='Optional: With --batch-dirs, pack several small projects into '
+                             'each request')
     parser.add_argument('-o', '--output_file',
                         metavar='output_file',
                         type=str,
@@ -285,51 +1068,91 @@ if __name__ == '__main__':
                         metavar='groq_api_key',
                         type=str,
                         help='Optional: Groq API Key to access other larger models')
+    parser.add_argument('--no-minify',
+                        action='store_true',
+                        help='Optional: Send source files as is, without stripping comments')
+    parser.add_argument('--token-budget',
+                        metavar='token_budget',
+                        type=int,
+                        help='Optional: Maximum number of prompt tokens per project, defaults '
+                             'to 90%% of the model\'s context window')
+    parser.add_argument('--max-concurrency',
+                        metavar='max_concurrency',
+                        type=int,
+                        default=MAX_CONCURRENCY,
+                        help='Optional: Maximum number of concurrent requests with --batch-dirs')
 
     args = parser.parse_args()
     target_dir = args.directory
+    batch_dirs = args.batch_dirs
     output_file = args.output_file
     gemini_api_key = args.gemini_api_key
     openai_api_key = args.openai_api_key
     groq_api_key = args.groq_api_key
-
-    # Read codebase files
-    code_data = read_codebase(target_dir)
-
-    if code_data:
-        # Format the data for the prompt
-        formatted_prompt_content = format_codebase_for_prompt(code_data)
-
-        # Generate README.md
-        generated_readme = handle_generation(formatted_prompt_content,
-                                             gemini_api_key,
-                                             openai_api_key,
-                                             groq_api_key)
-        # Clean up AI output as it might start the markdown file with ```markdown
-        # and end with ``` even thought it should be the raw content
-        raw_readme = clean_ai_output(generated_readme)
-
+    if args.max_concurrency < 1:
+        parser.error('--max-concurrency must be at least 1')
+    if args.marshal and not batch_dirs:
+        parser.error('--marshal can only be used with --batch-dirs')
+
+    token_budget = args.token_budget
+    if token_budget is None:
+        # A project can end up alone in its marshaled group, so budget for the system
+        # prompt it will actually be sent with
+        token_budget = prompt_token_budget(gemini_api_key,
+                                           openai_api_key,
+                                           groq_api_key,
+                                           MULTI_PROJECT_SYSTEM_PROMPT if args.marshal
+                                           else SYSTEM_PROMPT)
+
+    if batch_dirs:
         if output_file:
-            print(output_file)
-            # Generate readme with AI and save to output_file
-            try:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(raw_readme)
-                    print(f"\nGenerated README.md saved to {output_file}")
-            except IOError as e:
-                print(f"\nError writing to output file {output_file}: {e}", file=sys.stderr)
+            parser.error('-o/--output_file can not be used with --batch-dirs')
+
+        batch_targets = []
+        batch_prompts = []
+        for batch_dir in batch_dirs:
+            prompt_content = build_prompt(batch_dir, not args.no_minify, token_budget)
+            if prompt_content is None:
+                print(f"Could not read any relevant code content in {batch_dir}.")
+                continue
+            batch_targets.append(batch_dir)
+            batch_prompts.append(prompt_content)
+
+        if args.marshal:
+            projects = [(os.path.basename(os.path.normpath(batch_dir)), prompt_content)
+                        for batch_dir, prompt_content in zip(batch_targets, batch_prompts)]
+            results = asyncio.run(handle_generation_marshaled(projects,
+                                                              gemini_api_key,
+                                                              openai_api_key,
+                                                              groq_api_key,
+                                                              args.max_concurrency))
         else:
-            # Generate readme with AI and save to /tmp/
-            output_dir = '/tmp/generated_readme'
-            if not os.path.isdir(output_dir):
-                os.makedirs(output_dir)
-                print(f"Directory created: {output_dir}")
-
-            output_filename = str(uuid.uuid4()) + '.md'
-            output_path = os.path.join(output_dir, output_filename)
-
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(raw_readme)
-                print(f"\nGenerated README.md saved to {output_path}")
+            results = asyncio.run(handle_generation_many(batch_prompts,
+                                                         gemini_api_key,
+                                                         openai_api_key,
+                                                         groq_api_key,
+                                                         args.max_concurrency))
+        for batch_dir, generated_readme in zip(batch_targets, results):
+            if isinstance(generated_readme, BaseException):
+                print(f"\nError generating README.md for {batch_dir}: {generated_readme}",
+                      file=sys.stderr)
+                continue
+            print(f"\n{batch_dir}:")
+            save_readme(clean_ai_output(generated_readme), None)
     else:
-        print("Could not read any relevant code content.")
+        # Read codebase files and format them for the prompt as they come in
+        formatted_prompt_content = build_prompt(target_dir, not args.no_minify, token_budget)
+
+        if formatted_prompt_content is not None:
+            # Generate README.md
+            generated_readme = handle_generation(formatted_prompt_content,
+                                                 gemini_api_key,
+                                                 openai_api_key,
+                                                 groq_api_key)
+            # Clean up AI output as it might start the markdown file with ```markdown
+            # and end with ``` even thought it should be the raw content
+            raw_readme = clean_ai_output(generated_readme)
+
+            save_readme(raw_readme, output_file)
+        else:
+            print("Could not read any relevant code content.")
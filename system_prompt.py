@@ -139,3 +139,21 @@ calmly explain that you're unable to do that right now.
     - VERIFY that your entire response consists ONLY of the RAW Markdown content and nothing else.
 </output>
 """
+
+# Used when several small projects are packed into one request, each project's README is
+# preceded by its own marker so the response can be split back per project
+README_MARKER = "<<<README {index}>>>"
+
+MULTI_PROJECT_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+<multiple_projects>
+- The input may contain SEVERAL independent projects, each one starting with a header line
+    of the form `=== Project N: <name> ===` followed by that project's files.
+- Treat every project separately, never mix information between projects.
+- Generate one complete README.md for EACH project, following all the rules above.
+- These instructions OVERRIDE the Final Output Format above on one point only:
+    - Before each README, output a line containing EXACTLY `<<<README N>>>`, where N is the
+        number of the project from its header, then the RAW Markdown content of that README.
+    - Output the READMEs in the same order as the projects, with nothing else between them.
+    - The response MUST start EXACTLY with `<<<README 1>>>`.
+</multiple_projects>
+"""
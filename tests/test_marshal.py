@@ -0,0 +1,25 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import split_multi_readme_output
+
+
+class SplitMultiReadmeOutputTest(unittest.TestCase):
+    def test_splits_in_project_order(self):
+        response = '<<<README 2>>>\n# B\n<<<README 1>>>\n# A\n'
+        self.assertEqual(split_multi_readme_output(response, 2), ['# A', '# B'])
+
+    def test_outer_fence_is_stripped(self):
+        response = '```markdown\n<<<README 1>>>\n# A\n\n<<<README 2>>>\n# B\n```'
+        self.assertEqual(split_multi_readme_output(response, 2), ['# A', '# B'])
+
+    def test_missing_readme_raises(self):
+        with self.assertRaises(ValueError):
+            split_multi_readme_output('<<<README 1>>>\n# A\n', 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import _minify
+
+
+class MinifyCLikeTest(unittest.TestCase):
+    def test_rust_lifetimes_are_not_char_literals(self):
+        code = b'''impl<'a> Foo<'a> { fn f(&self) -> &'a str { "don't //strip me" } }'''
+        self.assertEqual(_minify(code, '.rs'), code)
+
+    def test_rust_char_literals(self):
+        code = b"let c = '/'; // slash\nlet e = '\\''; let u = '\\u{1F600}'; // emoji\n"
+        self.assertEqual(_minify(code, '.rs'),
+                         b"let c = '/';\nlet e = '\\''; let u = '\\u{1F600}';\n")
+
+    def test_c_comments_are_stripped(self):
+        code = b'/* header\n   comment */\nint main() { // entry\n    return 0; /* done */\n}\n'
+        self.assertEqual(_minify(code, '.c'), b'int main() {\n    return 0;\n}\n')
+
+    def test_comment_markers_in_strings_are_kept(self):
+        code = b'const char *url = "http://example.com/*x*/"; // link\n'
+        self.assertEqual(_minify(code, '.c'),
+                         b'const char *url = "http://example.com/*x*/";\n')
+
+    def test_escaped_quotes_in_strings(self):
+        code = b'printf("say \\"hi\\" // not a comment"); // comment\n'
+        self.assertEqual(_minify(code, '.c'),
+                         b'printf("say \\"hi\\" // not a comment");\n')
+
+    def test_c_char_literal_with_quote(self):
+        code = b"if (c == '\"') { s = \"// str\"; } // end\n"
+        self.assertEqual(_minify(code, '.c'), b"if (c == '\"') { s = \"// str\"; }\n")
+
+    def test_rust_raw_strings(self):
+        code = b'let s = r#"a " // b"#; } // c\nlet t = br"x // y"; // z\n'
+        self.assertEqual(_minify(code, '.rs'),
+                         b'let s = r#"a " // b"#; }\nlet t = br"x // y";\n')
+
+    def test_cpp_raw_strings(self):
+        code = b'auto s = R"js(a ")" // b)js"; // c\n'
+        self.assertEqual(_minify(code, '.cpp'), b'auto s = R"js(a ")" // b)js";\n')
+
+    def test_go_raw_strings(self):
+        code = b'var re = `C:\\dir // not a comment` // comment\nr := \'/\'\n'
+        self.assertEqual(_minify(code, '.go'),
+                         b'var re = `C:\\dir // not a comment`\nr := \'/\'\n')
+
+    def test_js_single_quoted_and_template_strings(self):
+        code = (b"let s = 'it\\'s // not'; // comment\n"
+                b"let t = `a // b\n/* c */`; /* gone */\n")
+        self.assertEqual(_minify(code, '.js'),
+                         b"let s = 'it\\'s // not';\nlet t = `a // b\n/* c */`;\n")
+
+    def test_js_regex_literals(self):
+        code = b'const re = /https?:\\/\\//; // c\n// line\nf(); //x\n'
+        self.assertEqual(_minify(code, '.js'), b'const re = /https?:\\/\\//;\n\nf();\n')
+
+    def test_blank_runs_and_trailing_whitespace(self):
+        code = b'a();   \n\n\n\n\nb();\t\n'
+        self.assertEqual(_minify(code, '.ts'), b'a();\n\nb();\n')
+
+    def test_crlf_line_endings(self):
+        code = b'int a; // c\r\n\r\n\r\n\r\n\r\nint b;   \r\n'
+        self.assertEqual(_minify(code, '.c'), b'int a;\n\nint b;\n')
+
+
+class MinifyPythonTest(unittest.TestCase):
+    def test_comments_are_stripped_and_strings_kept(self):
+        code = (b'# comment\n'
+                b'def f(x):  # trailing\n'
+                b'    """doc # not a comment"""\n'
+                b'    return "# keep"\n')
+        self.assertEqual(_minify(code, '.py'),
+                         b'def f(x):\n    """doc # not a comment"""\n    return "# keep"\n')
+
+    def test_crlf_line_endings(self):
+        code = b'x = 1\r\n# c\r\n\r\n\r\ny = 2  # d\r\n'
+        self.assertEqual(_minify(code, '.py'), b'x = 1\n\ny = 2\n')
+
+    def test_invalid_python_is_left_alone(self):
+        code = b'def (:\n  # x\n'
+        self.assertEqual(_minify(code, '.py'), code)
+
+
+if __name__ == '__main__':
+    unittest.main()